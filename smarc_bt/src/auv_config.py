@@ -108,6 +108,10 @@ class AUVConfig(object):
         self.SWATH = 20
         # function of distance traveled. 0.01 means 1 meter error per 100m travel
         self.LOCALIZATION_ERROR_GROWTH = 0.02
+        # convert lat/lon to utm in-process with pyproj instead of the service
+        # it is also the fallback if the service can not be reached, but only
+        # when the utm_zone and utm_band params are set
+        self.USE_PYPROJ = False
 
         # Algae farm
         self.BUOY_TOPIC = 'sim/marked_positions'
@@ -12,7 +12,6 @@ from enum import Enum
 
 import rospy
 import bb_enums
-from tf.transformations import quaternion_from_euler
 from smarc_msgs.msg import GotoWaypoint
 
 class TurnType(Enum):
@@ -46,6 +45,12 @@ class Trajectory:
         self.y = y
 
 
+def yaw_to_quaternion(yaw):
+    # quaternion_from_euler(0, 0, yaw) without the general roll/pitch composition
+    # yaw [rad] can be a single angle or an array of them, the result is already normalized
+    half = np.multiply(yaw, 0.5)
+    return 0.0, 0.0, np.sin(half), np.cos(half)
+
 def wrapTo180(angle):
     angle =  angle % 360
     angle = (angle + 360) % 360
@@ -53,21 +58,40 @@ def wrapTo180(angle):
         angle -= 360;
     return angle
 
+# Re-planning a mission solves the same waypoint pairs again, keep the solutions around
+# A plain dict instead of functools.lru_cache, which python 2 does not have
+_DUBINS_SOLUTIONS = {}
+_DUBINS_SOLUTIONS_MAX = 1024
+
 def calc_dubins_path(wpt1, wpt2, turn_radius):
     # Calculate a dubins path between two waypoints
     param = Param(wpt1, 0, 0)
+    param.turn_radius = turn_radius
+    key = (wpt1.x, wpt1.y, wpt1.psi, wpt2.x, wpt2.y, wpt2.psi, turn_radius)
+    solution = _DUBINS_SOLUTIONS.get(key)
+    if solution is None:
+        if len(_DUBINS_SOLUTIONS) >= _DUBINS_SOLUTIONS_MAX:
+            _DUBINS_SOLUTIONS.clear()
+        solution = solve_dubins(*key)
+        _DUBINS_SOLUTIONS[key] = solution
+    best_word, seg_final = solution
+    param.seg_final = list(seg_final)
+    param.type = TurnType(best_word)
+    return param
+
+def solve_dubins(x1, y1, psi1, x2, y2, psi2, turn_radius):
+    # Returns the best word and its segment lengths between two (x, y, psi[deg]) poses
     tz        = [0, 0, 0, 0, 0, 0]
     pz        = [0, 0, 0, 0, 0, 0]
     qz        = [0, 0, 0, 0, 0, 0]
-    param.seg_final = [0, 0, 0]
-    psi1 = wrapTo180(wpt1.psi)*math.pi/180
-    psi2 = wrapTo180(wpt2.psi)*math.pi/180
+    seg_final = (0, 0, 0)
+    psi1 = wrapTo180(psi1)*math.pi/180
+    psi2 = wrapTo180(psi2)*math.pi/180
 
-    param.turn_radius = turn_radius
-    dx = wpt2.x - wpt1.x
-    dy = wpt2.y - wpt1.y
+    dx = x2 - x1
+    dy = y2 - y1
     D = math.sqrt(dx*dx + dy*dy)
-    d = D/param.turn_radius # Normalize by turn radius
+    d = D/turn_radius # Normalize by turn radius
 
     theta = math.atan2(dy,dx) % (2*math.pi)
     alpha = (psi1 - theta) % (2*math.pi)
@@ -75,13 +99,16 @@ def calc_dubins_path(wpt1, wpt2, turn_radius):
     best_word = -1
     lowest_cost = -1
 
+    # All the options use the same few trig values, compute them once
+    trig = dubins_trig(alpha, beta)
+
     # Compute all Dubins paths between points
-    tz[0], pz[0], qz[0] = dubinsLSL(alpha,beta,d)
-    tz[1], pz[1], qz[1] = dubinsLSR(alpha,beta,d)
-    tz[2], pz[2], qz[2] = dubinsRSL(alpha,beta,d)
-    tz[3], pz[3], qz[3] = dubinsRSR(alpha,beta,d)
-    tz[4], pz[4], qz[4] = dubinsRLR(alpha,beta,d)
-    tz[5], pz[5], qz[5] = dubinsLRL(alpha,beta,d)
+    tz[0], pz[0], qz[0] = dubinsLSL(alpha,beta,d,trig)
+    tz[1], pz[1], qz[1] = dubinsLSR(alpha,beta,d,trig)
+    tz[2], pz[2], qz[2] = dubinsRSL(alpha,beta,d,trig)
+    tz[3], pz[3], qz[3] = dubinsRSR(alpha,beta,d,trig)
+    tz[4], pz[4], qz[4] = dubinsRLR(alpha,beta,d,trig)
+    tz[5], pz[5], qz[5] = dubinsLRL(alpha,beta,d,trig)
 
     # Pick the path with the lowest cost
     for k in range(len(tz)):
@@ -90,16 +117,22 @@ def calc_dubins_path(wpt1, wpt2, turn_radius):
             if(cost<lowest_cost or lowest_cost==-1):
                 best_word = k+1
                 lowest_cost = cost
-                param.seg_final = [tz[k],pz[k],qz[k]]
+                seg_final = (tz[k],pz[k],qz[k])
 
-    param.type = TurnType(best_word)
-    return param
+    return best_word, seg_final
+
+def dubins_trig(alpha, beta):
+    # sin(alpha), cos(alpha), sin(beta), cos(beta), cos(alpha-beta)
+    return math.sin(alpha), math.cos(alpha), math.sin(beta), math.cos(beta), math.cos(alpha-beta)
 
 # Compute all Dubins options
-def dubinsLSL(alpha, beta, d):
-    tmp0      = d + math.sin(alpha) - math.sin(beta)
-    tmp1      = math.atan2((math.cos(beta)-math.cos(alpha)),tmp0)
-    p_squared = 2 + d*d - (2*math.cos(alpha-beta)) + (2*d*(math.sin(alpha)-math.sin(beta)))
+def dubinsLSL(alpha, beta, d, trig=None):
+    if trig is None:
+        trig = dubins_trig(alpha, beta)
+    sa, ca, sb, cb, cab = trig
+    tmp0      = d + sa - sb
+    tmp1      = math.atan2((cb-ca),tmp0)
+    p_squared = 2 + d*d - (2*cab) + (2*d*(sa-sb))
     if p_squared<0:
         # print('No LSL Path')
         p=-1
@@ -111,10 +144,13 @@ def dubinsLSL(alpha, beta, d):
         q         = (beta - tmp1) % (2*math.pi)
     return t, p, q
 
-def dubinsRSR(alpha, beta, d):
-    tmp0      = d - math.sin(alpha) + math.sin(beta)
-    tmp1      = math.atan2((math.cos(alpha)-math.cos(beta)),tmp0)
-    p_squared = 2 + d*d - (2*math.cos(alpha-beta)) + 2*d*(math.sin(beta)-math.sin(alpha))
+def dubinsRSR(alpha, beta, d, trig=None):
+    if trig is None:
+        trig = dubins_trig(alpha, beta)
+    sa, ca, sb, cb, cab = trig
+    tmp0      = d - sa + sb
+    tmp1      = math.atan2((ca-cb),tmp0)
+    p_squared = 2 + d*d - (2*cab) + 2*d*(sb-sa)
     if p_squared<0:
         # print('No RSR Path')
         p=-1
@@ -126,9 +162,12 @@ def dubinsRSR(alpha, beta, d):
         q         = (-1*beta + tmp1) % (2*math.pi)
     return t, p, q
 
-def dubinsRSL(alpha,beta,d):
-    tmp0      = d - math.sin(alpha) - math.sin(beta)
-    p_squared = -2 + d*d + 2*math.cos(alpha-beta) - 2*d*(math.sin(alpha) + math.sin(beta))
+def dubinsRSL(alpha,beta,d, trig=None):
+    if trig is None:
+        trig = dubins_trig(alpha, beta)
+    sa, ca, sb, cb, cab = trig
+    tmp0      = d - sa - sb
+    p_squared = -2 + d*d + 2*cab - 2*d*(sa + sb)
     if p_squared<0:
         # print('No RSL Path')
         p=-1
@@ -136,14 +175,17 @@ def dubinsRSL(alpha,beta,d):
         t=-1
     else:
         p         = math.sqrt(p_squared)
-        tmp2      = math.atan2((math.cos(alpha)+math.cos(beta)),tmp0) - math.atan2(2,p)
+        tmp2      = math.atan2((ca+cb),tmp0) - math.atan2(2,p)
         t         = (alpha - tmp2) % (2*math.pi)
         q         = (beta - tmp2) % (2*math.pi)
     return t, p, q
 
-def dubinsLSR(alpha, beta, d):
-    tmp0      = d + math.sin(alpha) + math.sin(beta)
-    p_squared = -2 + d*d + 2*math.cos(alpha-beta) + 2*d*(math.sin(alpha) + math.sin(beta))
+def dubinsLSR(alpha, beta, d, trig=None):
+    if trig is None:
+        trig = dubins_trig(alpha, beta)
+    sa, ca, sb, cb, cab = trig
+    tmp0      = d + sa + sb
+    p_squared = -2 + d*d + 2*cab + 2*d*(sa + sb)
     if p_squared<0:
         # print('No LSR Path')
         p=-1
@@ -151,13 +193,16 @@ def dubinsLSR(alpha, beta, d):
         t=-1
     else:
         p         = math.sqrt(p_squared)
-        tmp2      = math.atan2((-1*math.cos(alpha)-math.cos(beta)),tmp0) - math.atan2(-2,p)
+        tmp2      = math.atan2((-1*ca-cb),tmp0) - math.atan2(-2,p)
         t         = (tmp2 - alpha) % (2*math.pi)
         q         = (tmp2 - beta) % (2*math.pi)
     return t, p, q
 
-def dubinsRLR(alpha, beta, d):
-    tmp_rlr = (6 - d*d + 2*math.cos(alpha-beta) + 2*d*(math.sin(alpha)-math.sin(beta)))/8
+def dubinsRLR(alpha, beta, d, trig=None):
+    if trig is None:
+        trig = dubins_trig(alpha, beta)
+    sa, ca, sb, cb, cab = trig
+    tmp_rlr = (6 - d*d + 2*cab + 2*d*(sa-sb))/8
     if(abs(tmp_rlr)>1):
         # print('No RLR Path')
         p=-1
@@ -165,13 +210,16 @@ def dubinsRLR(alpha, beta, d):
         t=-1
     else:
         p = (2*math.pi - math.acos(tmp_rlr)) % (2*math.pi)
-        t = (alpha - math.atan2((math.cos(alpha)-math.cos(beta)), d-math.sin(alpha)+math.sin(beta)) + p/2 % (2*math.pi)) % (2*math.pi)
+        t = (alpha - math.atan2((ca-cb), d-sa+sb) + p/2 % (2*math.pi)) % (2*math.pi)
         q = (alpha - beta - t + (p % (2*math.pi))) % (2*math.pi)
 
     return t, p, q
 
-def dubinsLRL(alpha, beta, d):
-    tmp_lrl = (6 - d*d + 2*math.cos(alpha-beta) + 2*d*(-1*math.sin(alpha)+math.sin(beta)))/8
+def dubinsLRL(alpha, beta, d, trig=None):
+    if trig is None:
+        trig = dubins_trig(alpha, beta)
+    sa, ca, sb, cb, cab = trig
+    tmp_lrl = (6 - d*d + 2*cab + 2*d*(-1*sa+sb))/8
     if(abs(tmp_lrl)>1):
         # print('No LRL Path')
         p=-1
@@ -179,7 +227,7 @@ def dubinsLRL(alpha, beta, d):
         t=-1
     else:
         p = (2*math.pi - math.acos(tmp_lrl)) % (2*math.pi)
-        t = (-1*alpha - math.atan2((math.cos(alpha)-math.cos(beta)), d+math.sin(alpha)-math.sin(beta)) + p/2) % (2*math.pi)
+        t = (-1*alpha - math.atan2((ca-cb), d+sa-sb) + p/2) % (2*math.pi)
         q = ((beta % (2*math.pi))-alpha-t+(p % (2*math.pi))) % (2*math.pi)
         # print(t,p,q,beta,alpha)
     return t, p, q
@@ -302,7 +350,7 @@ def circle_line_segment_intersection(circle_center, circle_radius, pt1, pt2, ful
             return intersections
 
 
-def dubins_mission_planner(mission, bb, ll_to_utm_serv, utm_to_ll_serv, utm_to_latlon, latlon_to_utm, num_points=2, inside_turn=True):
+def dubins_mission_planner(mission, bb, ll_to_utm_serv, utm_to_ll_serv, utm_to_latlon, latlon_to_utm_batch, num_points=2, inside_turn=True):
     '''
     Reads the waypoints from a MissionControl message and generates a sampled dubins
     path between them.
@@ -311,49 +359,55 @@ def dubins_mission_planner(mission, bb, ll_to_utm_serv, utm_to_ll_serv, utm_to_l
     :param num_points: the amount of waypoints to keep on each segment between waypoints
     :param inside_turn: cut the waypoints corners
     :return MissionControl.msg: new MissionControl message equal to the input one exc   ept for the waypoints attribute
+                                or None if the waypoints could not be converted to/from utm
+                                or two of them are closer than the intersection radius to turn inside
     '''
 
     rospy.loginfo("Computing dubins path")
 
     turn_radius = bb.get(bb_enums.DUBINS_TURNING_RADIUS)
     int_radius = bb.get(bb_enums.DUBINS_INTERSECTION_RADIUS)
-    vehicle = bb.get(bb_enums.VEHICLE_STATE)
-
-    # Get the auv's current position to use as the intial point of the dubins path
-    utm_x_auv, utm_y_auv = vehicle.position_utm
-    auv_utm = np.array([utm_x_auv, utm_y_auv])
 
-    # Get x, y of waypoints from original mission lat/lon
-    points = []
-    for wp in mission.waypoints:
-        utm_x, utm_y = latlon_to_utm(wp.lat, wp.lon, wp.pose.pose.position.z, serv=ll_to_utm_serv, in_degrees=True)
-        points.append([utm_x, utm_y, wp.goal_tolerance, wp.z_control_mode, wp.travel_altitude, wp.travel_depth, wp.speed_control_mode, wp.travel_rpm, wp.travel_speed])
-    points_np = np.array(points)
-    # points_with_auv = np.vstack((auv_utm, points_np))
+    # Get x, y of waypoints from original mission lat/lon, all in one go
+    lats = np.array([wp.lat for wp in mission.waypoints])
+    lons = np.array([wp.lon for wp in mission.waypoints])
+    zs = np.array([wp.pose.pose.position.z for wp in mission.waypoints])
+    # Each row is x, y and the other wp details
+    points_np = np.empty((len(mission.waypoints), 9))
+    points_np[:, :2] = latlon_to_utm_batch(lats, lons, zs, serv=ll_to_utm_serv, in_degrees=True)
+    if np.any(np.isnan(points_np[:, :2])):
+        rospy.logerr("Could not convert the mission waypoints to utm, can not compute the dubins path!")
+        return None
+    for i, wp in enumerate(mission.waypoints):
+        points_np[i, 2:] = (wp.goal_tolerance, wp.z_control_mode, wp.travel_altitude, wp.travel_depth, wp.speed_control_mode, wp.travel_rpm, wp.travel_speed)
 
     if not inside_turn:
         rospy.loginfo("Turning outside")
         original_waypoints = points_np
     else:
         rospy.loginfo("Turning inside")
-        waypoints = []
-        for i in range(len(points_np)-1):
-            waypoints_i = circle_line_segment_intersection(circle_center=(points_np[i, 0], points_np[i, 1]), circle_radius=int_radius,
-                                                            pt1=(points_np[i, 0], points_np[i, 1]), pt2=(points_np[i+1, 0], points_np[i+1, 1]))
-            waypoints.append(np.array(waypoints_i).flatten())
+        # Two intersection wps on each segment between wps, then the last wp
+        num_segments = len(points_np)-1
+        waypoints_np = np.empty((2*num_segments+1, points_np.shape[1]))
+        for i in range(num_segments):
+            pt1 = (points_np[i, 0], points_np[i, 1])
+            pt2 = (points_np[i+1, 0], points_np[i+1, 1])
+            waypoints_i = circle_line_segment_intersection(circle_center=pt1, circle_radius=int_radius, pt1=pt1, pt2=pt2)
+            waypoints_j = circle_line_segment_intersection(circle_center=pt2, circle_radius=int_radius, pt1=pt1, pt2=pt2)
+            if len(waypoints_i) == 0 or len(waypoints_j) == 0:
+                rospy.logerr("Waypoints {} and {} are closer than the intersection radius ({}m), can not compute the dubins path!".format(i, i+1, int_radius))
+                return None
+
+            waypoints_np[2*i, :2] = waypoints_i[0]
             # Include the other wp details
-            waypoints[-1] = np.append(waypoints[-1], points_np[i, 2:])
+            waypoints_np[2*i, 2:] = points_np[i, 2:]
 
-            waypoints_j = circle_line_segment_intersection(circle_center=(points_np[i+1, 0], points_np[i+1, 1]), circle_radius=int_radius,
-                                                            pt1=(points_np[i, 0], points_np[i, 1]), pt2=(points_np[i+1, 0], points_np[i+1, 1]))
-            waypoints.append(np.array(waypoints_j).flatten())
+            waypoints_np[2*i+1, :2] = waypoints_j[0]
             # Include the other wp details
-            waypoints[-1] = np.append(waypoints[-1], points_np[i+1, 2:])
+            waypoints_np[2*i+1, 2:] = points_np[i+1, 2:]
 
-        waypoints.append([(points_np[-1, 0], points_np[-1, 1])])
-        waypoints[-1] = np.append(waypoints[-1], points_np[-1, 2:])
-        waypoints_np = np.array(waypoints)
-        original_waypoints = waypoints_np.squeeze()  # Remove useless extra dimension
+        waypoints_np[-1] = points_np[-1]
+        original_waypoints = waypoints_np
 
     # Compute angle between waypoints and get the new wps array
     waypoints_complete, _ = waypoints_with_yaw(original_waypoints)
@@ -363,92 +417,100 @@ def dubins_mission_planner(mission, bb, ll_to_utm_serv, utm_to_ll_serv, utm_to_l
         param = calc_dubins_path(waypoints_complete[j], waypoints_complete[j+1], turn_radius)
         path.append(dubins_traj(param, 1))
 
-    dubins_waypoints = []
     # Only define the new waypoints on the original waypoint and on the curve
     # Each element of path is an array of points between on waypoint and the next one
-    for i, el in enumerate(path):
-        # Compute the differnece between orientation
-        # The maxima represent the points on the curve
-        delta_angles = abs(np.diff(el[:, 2]))
-        delta_angles = [0] + delta_angles
-        # Keep two points in each curve
-        max_idxs = np.argpartition(delta_angles, -num_points)[-num_points:]
-        max_idxs = np.sort(max_idxs)
-        for ind in max_idxs:
-            # A row of path[i] represents a single point
-            dubins_waypoints.append(el[ind])
+    # All the segments are handled together in one pass over the full path
+    seg_lens = np.array([len(el) for el in path], dtype=int)
+    # The first point of a segment is its starting wp, which is never sampled,
+    # so short segments give fewer than num_points wps
+    seg_picks = np.clip(seg_lens - 1, 0, num_points)
+    if np.any(seg_picks < num_points):
+        rospy.loginfo("Dubins segments {} are short, sampling fewer than {} waypoints on them".format(np.flatnonzero(seg_picks < num_points).tolist(), num_points))
+    seg_starts = np.cumsum(seg_lens) - seg_lens
+    seg_ids = np.repeat(np.arange(len(path)), seg_lens)
+    full_path = np.empty((np.sum(seg_lens), 3))
+    for el, offset in zip(path, seg_starts):
+        full_path[offset:offset+len(el)] = el
+
+    # Compute the differnece between orientation
+    # The maxima represent the points on the curve
+    # The first point of every segment is the original waypoint, which is added
+    # back below, so it is never picked
+    delta_angles = np.zeros(len(full_path))
+    delta_angles[1:] = np.abs(np.diff(full_path[:, 2]))
+    delta_angles[seg_starts[seg_lens > 0]] = -np.inf
+
+    # Equal orientation changes (straight lines, constant curvature arcs) are
+    # broken by picking the points closest to the middle of the segment
+    pos_in_seg = np.arange(len(full_path)) - seg_starts[seg_ids]
+    dist_to_mid = np.abs(pos_in_seg - (seg_lens[seg_ids] - 1) / 2.0)
+
+    # Order by segment, then by decreasing orientation change within the segment
+    # and keep the first seg_picks of each segment (two points in each curve)
+    by_turn = np.lexsort((dist_to_mid, -delta_angles, seg_ids))
+    max_idxs = by_turn[pos_in_seg < seg_picks[seg_ids]]
 
     # Sort the waypoints
-    full_path = []
-    ordered_idxs = []
-    for el in path:
-        for e in el:
-            full_path.append([e[0], e[1], e[2]])
-    for j, el in enumerate(dubins_waypoints):
-        try:
-            # Get the dubins wp index in the full path
-            ordered_idxs.append(full_path.index([el[0], el[1], el[2]]))
-        except ValueError:
-            rospy.logwarn("Point " + str(j) + " not found in the path!")
-    ordered_idxs = np.sort(ordered_idxs)
-    dubins_waypoints_ordered = [full_path[i] for i in ordered_idxs]
+    # The indices point into the full path, so sorting them orders the wps along it
+    dubins_waypoints_ordered = full_path[np.sort(max_idxs)].tolist()
 
     # Include original waypoints
     wp_i = 0
-    for wp in waypoints_complete[:-1]:
+    for wp, picks in zip(waypoints_complete[:-1], seg_picks):
         dubins_waypoints_ordered.insert(wp_i, [wp.x, wp.y, wp.psi])
-        wp_i += num_points + 1
+        wp_i += picks + 1
     dubins_waypoints_ordered.append([waypoints_complete[-1].x, waypoints_complete[-1].y, waypoints_complete[-1].psi])
 
-    dubins_mission = mission
-    del dubins_mission.waypoints[:]
-
+    # Roll and pitch are always 0, all the orientations at once
+    _, _, quat_zs, quat_ws = yaw_to_quaternion(np.radians([wp[2] for wp in dubins_waypoints_ordered]))
+
+    # The wp details are shared by all the dubins wps between two original wps
+    # so build them once per original wp and hand them to the constructor
+    wp_templates = [{'goal_tolerance': owp[2],
+                     'z_control_mode': int(owp[3]),
+                     'travel_altitude': owp[4],
+                     'travel_depth': owp[5],
+                     'speed_control_mode': int(owp[6]),
+                     'travel_rpm': owp[7],
+                     'travel_speed': owp[8]} for owp in original_waypoints]
+
+    # Only replace the mission's waypoints once all of them are made
+    # The last original wp has no segment after it
+    wps_after = seg_picks.tolist() + [0]
+    dubins_wps = []
     current_wp = 0
     dwp_count = 0
-    for wp in dubins_waypoints_ordered:
-
-        goal_tolerance = original_waypoints[current_wp, 2]
-        z_control_mode = original_waypoints[current_wp, 3]
-        travel_altitude = original_waypoints[current_wp, 4]
-        travel_depth = original_waypoints[current_wp, 5]
-        speed_control_mode = original_waypoints[current_wp, 6]
-        travel_rpm = original_waypoints[current_wp, 7]
-        travel_speed = original_waypoints[current_wp, 8]
+    for k, wp in enumerate(dubins_waypoints_ordered):
+        template = wp_templates[current_wp]
 
-        dwp = GotoWaypoint()
+        # A new message for every wp, the mission must not hold references to the same one
+        dwp = GotoWaypoint(**template)
         dwp.pose.pose.position.x = wp[0]
         dwp.pose.pose.position.y = wp[1]
-        dwp.pose.pose.position.z = travel_altitude
+        dwp.pose.pose.position.z = template['travel_altitude']
         dwp.lat, dwp.lon = utm_to_latlon(wp[0], wp[1], utm_to_ll_serv)
+        if dwp.lat is None:
+            rospy.logerr("Could not convert the dubins waypoints to lat/lon, can not compute the dubins path!")
+            return None
 
-        quaternion = quaternion_from_euler(0.0, 0.0, math.radians(wp[2]))  # RPY [rad]
-        # Normalize quaternion
-        if len(quaternion) != 0:
-            quaternion = quaternion / np.sqrt(np.sum(quaternion**2))
-        dwp.pose.pose.orientation.x = quaternion[0]
-        dwp.pose.pose.orientation.y = quaternion[1]
-        dwp.pose.pose.orientation.z = quaternion[2]
-        dwp.pose.pose.orientation.w = quaternion[3]
-
-        dwp.goal_tolerance = goal_tolerance
-        dwp.z_control_mode = z_control_mode
-        dwp.travel_altitude = travel_altitude
-        dwp.travel_depth = travel_depth
-        dwp.speed_control_mode = speed_control_mode
-
-        dwp.travel_speed = travel_speed
-        dwp.travel_rpm = travel_rpm
+        dwp.pose.pose.orientation.x = 0.0
+        dwp.pose.pose.orientation.y = 0.0
+        dwp.pose.pose.orientation.z = quat_zs[k]
+        dwp.pose.pose.orientation.w = quat_ws[k]
 
         # Name of the dwp = previousoriginalwp_nextoriginalwp_counter
         dwp.name = "wp" + str(current_wp) + "_wp" + str(current_wp+1) + "_" + str(dwp_count)
 
-        if dwp_count == num_points:
+        if dwp_count == wps_after[current_wp]:
             dwp_count = 0
             current_wp += 1
         else:
             dwp_count += 1
 
-        dubins_mission.waypoints.append(dwp)
+        dubins_wps.append(dwp)
+
+    dubins_mission = mission
+    dubins_mission.waypoints[:] = dubins_wps
 
     rospy.loginfo("Dubins mission ready")
     return dubins_mission
@@ -10,6 +10,12 @@ import math
 import numpy as np
 import py_trees as pt
 
+try:
+    import pyproj
+except ImportError:
+    # only needed to convert lat/lon to utm without the service
+    pyproj = None
+
 import common_globals
 import imc_enums
 import bb_enums
@@ -22,7 +28,21 @@ from smarc_msgs.msg import GotoWaypointGoal, GotoWaypoint, MissionControl
 from coverage_planner import create_coverage_path
 from dubins import dubins_mission_planner
 
-class Waypoint:
+# control mode -> (GotoWaypoint field to compare, tolerance)
+# used to decide if two waypoints are too similar
+Z_CONTROL_TOLERANCES = {
+    GotoWaypoint.Z_CONTROL_DEPTH : ('travel_depth', 0.6), # hardcoded... i dont know what harsha is doing here?
+    GotoWaypoint.Z_CONTROL_ALTITUDE : ('travel_altitude', 0.6)
+}
+SPEED_CONTROL_TOLERANCES = {
+    GotoWaypoint.SPEED_CONTROL_RPM : ('travel_rpm', 50), #rpm
+    GotoWaypoint.SPEED_CONTROL_SPEED : ('travel_speed', 0.1) #m/s
+}
+
+class Waypoint(object):
+    # plans can have many thousands of these, no need for a __dict__ each
+    __slots__ = ('imc_man_id', 'wp', 'extra_data')
+
     def __init__(self,
                  goto_waypoint = None,
                  imc_man_id = None,
@@ -97,46 +117,39 @@ class Waypoint:
         """
         other_wp is a smarc_msgs GotoWaypoint
         """
-        xy_tolerance = min(self.wp.goal_tolerance, other_wp.goal_tolerance)
-        z_tolerance = 0.6 # hardcoded... i dont know what harsha is doing here?
-        rpm_tolerance = 50 #rpm
-        speed_tolerance = 0.1 #m/s
+        # walk the message attribute chains only once
+        sp = self.wp
+        op = other_wp
+        s_pos = sp.pose.pose.position
+        o_pos = op.pose.pose.position
+
+        xy_tolerance = min(sp.goal_tolerance, op.goal_tolerance)
+
+        # most wps are far apart, so check the distance first and bail early
+        # compare squared distances, no need for the sqrt
+        xy_dist_sq = (s_pos.x - o_pos.x)**2 + (s_pos.y - o_pos.y)**2
+        if xy_dist_sq >= xy_tolerance*xy_tolerance:
+            return False
 
-        xy_too_close = False
-        z_too_close = False
-        speed_too_close = False
+        z_mode = sp.z_control_mode
+        s_mode = sp.speed_control_mode
 
         # if the control mode is different, they _are_ different wps
-        if self.wp.z_control_mode != other_wp.z_control_mode:
+        if z_mode != op.z_control_mode or s_mode != op.speed_control_mode:
             return False
-        # otherwise, we gotta see if the _amounts_ are different enough
-        else:
-            if self.wp.z_control_mode == GotoWaypoint.Z_CONTROL_DEPTH:
-                z_too_close = abs(self.wp.travel_depth - other_wp.travel_depth) < z_tolerance
-
-            if self.wp.z_control_mode == GotoWaypoint.Z_CONTROL_ALTITUDE:
-                z_too_close = abs(self.wp.travel_altitude - other_wp.travel_altitude) < z_tolerance
 
-        # same with speed
-        if self.wp.speed_control_mode != other_wp.speed_control_mode:
+        # otherwise, we gotta see if the _amounts_ are different enough
+        # a mode with no tolerance (NONE) is never too close
+        z_field, z_tolerance = Z_CONTROL_TOLERANCES.get(z_mode, (None, None))
+        if z_field is None or abs(getattr(sp, z_field) - getattr(op, z_field)) >= z_tolerance:
             return False
-        else:
-            if self.wp.speed_control_mode == GotoWaypoint.SPEED_CONTROL_RPM:
-                speed_too_close = abs(self.wp.travel_rpm - other_wp.travel_rpm) < rpm_tolerance
-
-            if self.wp.speed_control_mode == GotoWaypoint.SPEED_CONTROL_SPEED:
-                speed_too_close = abs(self.wp.travel_speed - other_wp.travel_speed) < speed_tolerance
 
-        xy_dist = math.sqrt( (self.x - other_wp.pose.pose.position.x)**2 + (self.y - other_wp.pose.pose.position.y)**2 )
-        xy_too_close = xy_dist < xy_tolerance
+        speed_field, speed_tolerance = SPEED_CONTROL_TOLERANCES.get(s_mode, (None, None))
+        if speed_field is None or abs(getattr(sp, speed_field) - getattr(op, speed_field)) >= speed_tolerance:
+            return False
 
         # if all of them are too close, wps are similar
-        # otherwise they are different enough
-        # if the control modes are different, that was handled above already
-        return all((xy_too_close, z_too_close, speed_too_close))
-
-
-
+        return True
 
 
     @property
@@ -157,18 +170,19 @@ class Waypoint:
 
     @property
     def is_actionable(self):
-        if (self.x == 0 and self.y == 0) and self.frame_id == 'utm':
-            return False
-
-        return True
+        # a utm wp at (near) 0,0 is a failed latlon->utm conversion
+        # dont compare floats to exactly 0, conversions leave some noise
+        wp = self.wp
+        p = wp.pose.pose.position
+        return not (abs(p.x) < 1e-9 and abs(p.y) < 1e-9 and wp.pose.header.frame_id == 'utm')
 
     def read_imc_maneuver(self, maneuver, utm_x, utm_y, extra_data=None):
         gwp  = GotoWaypoint()
         gwp.pose.header.frame_id = 'utm'
         gwp.pose.pose.position.x = utm_x
         gwp.pose.pose.position.y = utm_y
-        gwp.lat = np.degrees(maneuver.lat) # because neptus uses radians, we use degrees
-        gwp.lon = np.degrees(maneuver.lon)
+        gwp.lat = math.degrees(maneuver.lat) # because neptus uses radians, we use degrees
+        gwp.lon = math.degrees(maneuver.lon)
         gwp.name = maneuver.maneuver_name
         gwp.goal_tolerance = 2 # to make this reactive, whoever sends the WP should set it
 
@@ -257,6 +271,26 @@ class MissionPlan:
                 rospy.logerr("The BT received a mission, tried to convert it to UTM coordinates using {} service and then {} as the backup and neither of them could be reached! Check the navigation/DR stack, the TF tree and the services!".format(self.latlontoutm_service_name, self.latlontoutm_service_name_alternative))
                 self.no_service = True
 
+        # keep one persistent connection to the services instead of
+        # looking them up and connecting for every conversion.
+        # these are dropped and re-made if a call through them fails.
+        self._ll2utm_proxy = None
+        self._utm2ll_proxy = None
+        if not self.no_service:
+            self._ll2utm_proxy = rospy.ServiceProxy(self.latlontoutm_service_name,
+                                                    LatLonToUTM,
+                                                    persistent=True)
+
+        # in-process lat/lon -> utm conversion, used instead of the service
+        # when asked for in the config or when the service can not be reached.
+        # falling back on our own needs the utm zone of the system, guessing
+        # it would put the whole mission in the wrong place
+        self._ll2utm_transformer = None
+        if auv_config.USE_PYPROJ:
+            self._ll2utm_transformer = self._make_latlon_to_utm_transformer()
+        elif self.no_service:
+            self._ll2utm_transformer = self._make_latlon_to_utm_transformer(need_zone_params=True)
+
         self.compute_dubins = self.bb.get(bb_enums.DUBINS_COMPUTE_PATH)
         self.utmtolatlon_service_name = auv_config.UTM_TO_LATLON_SERVICE
         try:
@@ -282,8 +316,12 @@ class MissionPlan:
         if waypoints is None and plandb_msg is not None:
             self.waypoints = self.read_plandb(plandb_msg)
         elif waypoints is None and mission_control_msg is not None:
+            dubins_mission = None
             if self.compute_dubins:
                 dubins_mission = self.generate_dubins(mission_control_msg)
+                if dubins_mission is None:
+                    rospy.logwarn("Could not compute the dubins path, using the mission waypoints as they are")
+            if dubins_mission is not None:
                 self.waypoints = self.read_mission_control(dubins_mission, is_in_utm=True)
             else:
                 self.waypoints = self.read_mission_control(mission_control_msg)
@@ -295,6 +333,10 @@ class MissionPlan:
         for wp in self.waypoints:
             self.waypoint_man_ids.append(wp.wp.name)
 
+        # spatial index over the xy of the waypoints
+        # built on demand, see build_kdtree
+        self._kdtree = None
+
         # keep track of which waypoint we are going to
         # start at -1 to indicate that _we are not going to any yet_
         self.current_wp_index = -1
@@ -303,35 +345,137 @@ class MissionPlan:
         self.plan_is_go = False
 
 
+    @property
+    def can_convert_latlon(self):
+        # either through the service or pyproj
+        return (not self.no_service) or self._ll2utm_transformer is not None
+
     def _get_latlon_to_utm_service(self):
+        if self._ll2utm_proxy is not None:
+            return self._ll2utm_proxy
+
         try:
             rospy.wait_for_service(self.latlontoutm_service_name, timeout=1)
         except:
             rospy.logwarn(str(self.latlontoutm_service_name)+" service not found!")
-            return (None, None)
+            return None
 
         try:
-            latlontoutm_service = rospy.ServiceProxy(self.latlontoutm_service_name,
-                                                     LatLonToUTM)
+            self._ll2utm_proxy = rospy.ServiceProxy(self.latlontoutm_service_name,
+                                                    LatLonToUTM,
+                                                    persistent=True)
         except rospy.service.ServiceException:
             rospy.logerr_throttle_identical(5, "LatLon to UTM service failed! namespace:{}".format(self.latlontoutm_service_name))
             return None
-        return latlontoutm_service
+        return self._ll2utm_proxy
 
     def _get_utm_to_latlon_service(self):
+        if self._utm2ll_proxy is not None:
+            return self._utm2ll_proxy
+
         try:
             rospy.wait_for_service(self.utmtolatlon_service_name, timeout=5)
         except:
             rospy.logwarn(str(self.utmtolatlon_service_name)+" service not found!")
-            return (None, None)
+            return None
 
         try:
-            utmtolatlon_service = rospy.ServiceProxy(self.utmtolatlon_service_name,
-                                                     UTMToLatLon)
+            self._utm2ll_proxy = rospy.ServiceProxy(self.utmtolatlon_service_name,
+                                                    UTMToLatLon,
+                                                    persistent=True)
         except rospy.service.ServiceException:
             rospy.logerr_throttle_identical(5, "UTM to LatLon service failed! namespace:{}".format(self.utmtolatlon_service_name))
             return None
-        return utmtolatlon_service
+        return self._utm2ll_proxy
+
+    def _make_latlon_to_utm_transformer(self, need_zone_params=False):
+        """
+        a function (lons, lats) -> (xs, ys) in the utm zone of the system, or None.
+        if need_zone_params, the utm_zone and utm_band params must exist,
+        otherwise the defaults in common_globals are used for the missing ones.
+        """
+        if pyproj is None:
+            rospy.logwarn("pyproj is not installed, lat/lon to utm can only be done through the service!")
+            return None
+
+        # same utm zone the rest of the system uses
+        zone_param = rospy.search_param('utm_zone')
+        band_param = rospy.search_param('utm_band')
+        if need_zone_params and (zone_param is None or band_param is None):
+            rospy.logerr("The utm_zone and utm_band params are not set, can not convert lat/lon to utm without the service!")
+            return None
+
+        zone = common_globals.DEFAULT_UTM_ZONE
+        band = common_globals.DEFAULT_UTM_BAND
+        if zone_param is not None:
+            zone = int(rospy.get_param(zone_param, zone))
+        else:
+            rospy.logwarn("No utm_zone param, using the default zone:{}".format(zone))
+        if band_param is not None:
+            band = str(rospy.get_param(band_param, band))
+        else:
+            rospy.logwarn("No utm_band param, using the default band:{}".format(band))
+
+        # bands N and above are in the northern hemisphere
+        south = band.upper() < 'N'
+        rospy.loginfo("Using pyproj for lat/lon to utm conversions, zone:{} band:{}".format(zone, band))
+
+        if hasattr(pyproj, 'Transformer'):
+            utm_crs = "EPSG:{}".format((32700 if south else 32600) + zone)
+            return pyproj.Transformer.from_crs("EPSG:4326", utm_crs, always_xy=True).transform
+        # pyproj < 2.1 (python-pyproj on melodic) only has Proj
+        return pyproj.Proj(proj='utm', zone=zone, south=south, ellps='WGS84')
+
+    def _transform_latlon_to_utm(self, lons, lats):
+        """
+        lons, lats in degrees -> xs, ys through the transformer.
+        pyproj gives inf (or raises, for old versions) for points it can not
+        convert, those come back as NaN.
+        """
+        try:
+            xs, ys = self._ll2utm_transformer(lons, lats)
+        except RuntimeError as e:
+            rospy.logerr("pyproj could not convert lat/lon:{} to utm: {}".format((lats, lons), e))
+            return np.nan * np.asarray(lons, dtype=np.float64), np.nan * np.asarray(lats, dtype=np.float64)
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        bad = ~(np.isfinite(xs) & np.isfinite(ys))
+        return np.where(bad, np.nan, xs), np.where(bad, np.nan, ys)
+
+    def _drop_latlon_to_utm_service(self):
+        # the persistent connection is dead, the next get will reconnect
+        if self._ll2utm_proxy is not None:
+            self._ll2utm_proxy.close()
+        self._ll2utm_proxy = None
+
+    def _drop_utm_to_latlon_service(self):
+        if self._utm2ll_proxy is not None:
+            self._utm2ll_proxy.close()
+        self._utm2ll_proxy = None
+
+
+    def _call_with_reconnect(self, serv, req, get_service, drop_service, service_name):
+        """
+        call serv with req. if the persistent connection died (the service node
+        was restarted etc.) drop it and retry once on a fresh one.
+        returns (response, the proxy that worked) or (None, None)
+        """
+        try:
+            return serv(req), serv
+        except (rospy.service.ServiceException, rospy.exceptions.TransportException):
+            rospy.logerr_throttle_identical(5, "Service call failed, reconnecting! namespace:{}".format(service_name))
+            drop_service()
+
+        serv = get_service()
+        if serv is None:
+            return None, None
+
+        try:
+            return serv(req), serv
+        except (rospy.service.ServiceException, rospy.exceptions.TransportException):
+            rospy.logerr_throttle_identical(5, "Service call failed after reconnecting! namespace:{}".format(service_name))
+            drop_service()
+            return None, None
 
 
     def latlon_to_utm(self,
@@ -341,6 +485,15 @@ class MissionPlan:
                       in_degrees=False,
                       serv=None):
 
+        if self._ll2utm_transformer is not None:
+            if not in_degrees:
+                lat = math.degrees(lat)
+                lon = math.degrees(lon)
+            x, y = self._transform_latlon_to_utm(lon, lat)
+            if np.isnan(x):
+                return (None, None)
+            return (float(x), float(y))
+
         if serv is None:
             serv = self._get_latlon_to_utm_service()
             if serv is None:
@@ -351,12 +504,68 @@ class MissionPlan:
             gp.latitude = lat
             gp.longitude = lon
         else:
-            gp.latitude = np.degrees(lat)
-            gp.longitude = np.degrees(lon)
+            gp.latitude = math.degrees(lat)
+            gp.longitude = math.degrees(lon)
         gp.altitude = z
-        res = serv(gp)
+        res, _ = self._call_with_reconnect(serv,
+                                           gp,
+                                           self._get_latlon_to_utm_service,
+                                           self._drop_latlon_to_utm_service,
+                                           self.latlontoutm_service_name)
+        if res is None:
+            return (None, None)
         return (res.utm_point.x, res.utm_point.y)
 
+    def latlon_to_utm_batch(self,
+                            lats,
+                            lons,
+                            zs,
+                            in_degrees=False,
+                            serv=None):
+        """
+        convert many lat/lon/z points at once.
+        the service only takes one GeoPoint per call, so the proxy is
+        acquired once and re-used for every point instead of
+        waiting for the service and making a new proxy per point.
+        if pyproj is used, all the points are converted in one call without the service.
+        returns an Nx2 array of utm x,y, the rows that could not be
+        converted (service unreachable, pyproj failed) are NaN
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if not in_degrees:
+            lats = np.degrees(lats)
+            lons = np.degrees(lons)
+
+        if self._ll2utm_transformer is not None:
+            xs, ys = self._transform_latlon_to_utm(lons, lats)
+            return np.column_stack((xs, ys))
+
+        if serv is None:
+            serv = self._get_latlon_to_utm_service()
+            if serv is None:
+                return np.full((len(lats), 2), np.nan)
+
+        zs = np.broadcast_to(np.asarray(zs, dtype=np.float64), lats.shape)
+
+        utm_points = np.full((len(lats), 2), np.nan)
+        gp = GeoPoint()
+        for i in range(len(lats)):
+            gp.latitude = lats[i]
+            gp.longitude = lons[i]
+            gp.altitude = zs[i]
+            # keep using whichever proxy worked, in case it had to reconnect
+            res, serv = self._call_with_reconnect(serv,
+                                                  gp,
+                                                  self._get_latlon_to_utm_service,
+                                                  self._drop_latlon_to_utm_service,
+                                                  self.latlontoutm_service_name)
+            if res is None:
+                # no connection left, the rest stay NaN
+                break
+            utm_points[i] = (res.utm_point.x, res.utm_point.y)
+        return utm_points
+
     def utm_to_latlon(self,
                       utm_x,
                       utm_y,
@@ -371,7 +580,13 @@ class MissionPlan:
         point.x = utm_x
         point.y = utm_y
 
-        res = serv(point)
+        res, _ = self._call_with_reconnect(serv,
+                                           point,
+                                           self._get_utm_to_latlon_service,
+                                           self._drop_utm_to_latlon_service,
+                                           self.utmtolatlon_service_name)
+        if res is None:
+            return (None, None)
 
         return (res.lat_lon_point.latitude, res.lat_lon_point.longitude)
 
@@ -383,15 +598,25 @@ class MissionPlan:
         """
         self.plan_id = msg.name
         waypoints = []
-        serv = self._get_latlon_to_utm_service()
+        serv = None
+        if not is_in_utm and self._ll2utm_transformer is None:
+            serv = self._get_latlon_to_utm_service()
         for wp_msg in msg.waypoints:
             wp = Waypoint(goto_waypoint = wp_msg,
                           imc_man_id = imc_enums.MANEUVER_GOTO)
             # also make sure they are in utm
-            if is_in_utm:
-                wp.wp.pose.header.frame_id = 'utm'
-            else:
-                wp.set_utm_from_latlon(serv, set_frame=True)
+            if not is_in_utm:
+                utm_x, utm_y = self.latlon_to_utm(wp_msg.lat,
+                                                  wp_msg.lon,
+                                                  0,
+                                                  in_degrees=True,
+                                                  serv=serv)
+                if utm_x is None:
+                    rospy.loginfo("Could not convert LATLON to UTM! Skipping point:{}".format((wp_msg.lat, wp_msg.lon, wp_msg.name)))
+                    continue
+                wp.wp.pose.pose.position.x = utm_x
+                wp.wp.pose.pose.position.y = utm_y
+            wp.wp.pose.header.frame_id = 'utm'
             waypoints.append(wp)
 
         return waypoints
@@ -404,7 +629,7 @@ class MissionPlan:
         planddb message is a bunch of nested objects,
         we want a list of waypoints in the local frame,
         """
-        if self.no_service:
+        if not self.can_convert_latlon:
             rospy.logerr("The BT can not reach the latlon_to_utm service!")
             return []
 
@@ -416,6 +641,12 @@ class MissionPlan:
         if len(plan_spec.maneuvers) <= 0:
             rospy.logwarn("THERE WERE NO MANEUVERS IN THE PLAN! plan_id:{} (Does this vehicle know of your plan's maneuvers?)".format(plan_id))
 
+        # get the service once for all the maneuvers
+        # the transformer does not need it
+        serv = None
+        if self._ll2utm_transformer is None:
+            serv = self._get_latlon_to_utm_service()
+
         for plan_man in plan_spec.maneuvers:
             man_id = plan_man.maneuver_id
             maneuver = plan_man.maneuver
@@ -430,7 +661,8 @@ class MissionPlan:
             if man_imc_id in [imc_enums.MANEUVER_GOTO, imc_enums.MANEUVER_SAMPLE]:
                 utm_x, utm_y = self.latlon_to_utm(maneuver.lat,
                                                   maneuver.lon,
-                                                  -maneuver.z)
+                                                  -maneuver.z,
+                                                  serv=serv)
                 if utm_x is None:
                     rospy.loginfo("Could not convert LATLON to UTM! Skipping point:{}".format((maneuver.lat, maneuver.lon, man_name)))
                     continue
@@ -459,7 +691,8 @@ class MissionPlan:
                 # always go to the point given in map as the first move.
                 utm_x, utm_y = self.latlon_to_utm(maneuver.lat,
                                                   maneuver.lon,
-                                                  -maneuver.z)
+                                                  -maneuver.z,
+                                                  serv=serv)
 
 
                 utm_poly_points = [(utm_x, utm_y)]
@@ -468,7 +701,14 @@ class MissionPlan:
                 # generate the waypoints here and add them as goto waypoints
                 if len(maneuver.polygon) > 2:
                     rospy.loginfo("Generating rectangular coverage pattern")
-                    utm_poly_points += [self.latlon_to_utm(polyvert.lat, polyvert.lon, -maneuver.z) for polyvert in maneuver.polygon]
+                    utm_polygon = self.latlon_to_utm_batch([polyvert.lat for polyvert in maneuver.polygon],
+                                                           [polyvert.lon for polyvert in maneuver.polygon],
+                                                           -maneuver.z,
+                                                           serv=serv)
+                    if np.any(np.isnan(utm_polygon)):
+                        rospy.loginfo("Could not convert the polygon LATLON to UTM! Skipping the CoverArea maneuver:{}".format(man_id))
+                        continue
+                    utm_poly_points += utm_polygon.tolist()
                     coverage_points = self.generate_coverage_pattern(utm_poly_points)
                 else:
                     rospy.loginfo("This polygon ({}) has too few polygons for a coverarea, it will be used as a simple waypoint!".format(man_id))
@@ -502,9 +742,45 @@ class MissionPlan:
                                     self.vehicle_localization_error_growth)
 
     def generate_dubins(self, mission):
-        ll_to_utm_serv = self._get_latlon_to_utm_service()
+        ll_to_utm_serv = None
+        if self._ll2utm_transformer is None:
+            ll_to_utm_serv = self._get_latlon_to_utm_service()
         utm_to_ll_serv = self._get_utm_to_latlon_service()
-        return dubins_mission_planner(mission, self.bb, ll_to_utm_serv, utm_to_ll_serv, self.utm_to_latlon, self.latlon_to_utm)
+        return dubins_mission_planner(mission, self.bb, ll_to_utm_serv, utm_to_ll_serv, self.utm_to_latlon, self.latlon_to_utm_batch)
+
+
+    def build_kdtree(self):
+        """
+        (re)build the xy kd-tree of the waypoints.
+        call this again if the waypoints are changed.
+        """
+        # only needed here, dont make scipy a requirement for the whole bt
+        from scipy.spatial import cKDTree
+        xys = np.array([[wp.x, wp.y] for wp in self.waypoints], dtype=np.float64).reshape(-1, 2)
+        self._kdtree = cKDTree(xys)
+        return self._kdtree
+
+    def find_similar_waypoints(self):
+        """
+        returns a list of (i,j) index pairs, i<j, of waypoints
+        that are too similar to each other.
+        only the waypoints within goal tolerance in xy are compared
+        instead of every pair.
+        """
+        if len(self.waypoints) < 2:
+            return []
+
+        if self._kdtree is None or self._kdtree.n != len(self.waypoints):
+            self.build_kdtree()
+
+        similar_pairs = []
+        for i, wp in enumerate(self.waypoints):
+            # the similarity check uses the smaller of the two tolerances
+            # so searching with ours never misses a pair
+            for j in sorted(self._kdtree.query_ball_point([wp.x, wp.y], wp.wp.goal_tolerance)):
+                if j > i and wp.is_too_similar_to_other(self.waypoints[j].wp):
+                    similar_pairs.append((i, j))
+        return similar_pairs
 
 
     def get_pose_array(self, flip_z=False):
@@ -512,15 +788,15 @@ class MissionPlan:
         pa.header.frame_id = self.plan_frame
 
         # add the rest of the waypoints
-        for wp in self.waypoints:
-            p = Pose()
-            p.position.x = wp.x
-            p.position.y = wp.y
-            if flip_z:
-                p.position.z = -wp.travel_depth
-            else:
-                p.position.z = wp.travel_depth
-            pa.poses.append(p)
+        # one walk down the attribute chains per waypoint
+        xyzs = np.empty((len(self.waypoints), 3))
+        for i, wp in enumerate(self.waypoints):
+            wpw = wp.wp
+            position = wpw.pose.pose.position
+            xyzs[i] = (position.x, position.y, wpw.travel_depth)
+        if flip_z:
+            xyzs[:, 2] *= -1
+        pa.poses = [Pose(position=Point(x=x, y=y, z=z)) for x, y, z in xyzs.tolist()]
 
         return pa
 
@@ -543,10 +819,7 @@ class MissionPlan:
 
 
     def __str__(self):
-        s = self.plan_id+':\n'
-        for wp in self.waypoints:
-            s += '\t'+str(wp)+'\n'
-        return s
+        return self.plan_id+':\n' + ''.join('\t'+str(wp)+'\n' for wp in self.waypoints)
 
 
 
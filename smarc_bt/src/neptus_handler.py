@@ -229,7 +229,7 @@ class NeptusHandler(object):
                                    coverage_swath = self._bb.get(bb_enums.SWATH),
                                    vehicle_localization_error_growth = self._bb.get(bb_enums.LOCALIZATION_ERROR_GROWTH))
 
-        if mission_plan.no_service:
+        if not mission_plan.can_convert_latlon:
             self.feedback_messages.append("MISSION PLAN HAS NO SERVICE")
             return
 